@@ -1,10 +1,19 @@
+import json
 import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import altair as alt
 import pandas as pd
+import pyarrow as pa
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 from sqlalchemy import create_engine, text
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
 
 
 @st.cache_resource
@@ -13,6 +22,27 @@ def get_engine():
     return create_engine(pg["url"])
 
 
+def fetch_df(sql, params=None):
+    """
+    Eksekusi query dan bangun DataFrame langsung dari rows hasil fetch,
+    dengan nama kolom dari cursor (tanpa lewat pd.read_sql).
+    Kolom langsung dijadikan Arrow-backed dtype, format yang sama dengan yang
+    dikirim Streamlit ke browser, jadi tidak perlu konversi ulang tiap rerun.
+    """
+    with get_engine().connect() as conn:
+        result = conn.execute(text(sql), params or {})
+        rows = result.fetchall()
+        columns = list(result.keys())
+    # coerce_float=True seperti pd.read_sql: kolom numeric Postgres (Decimal)
+    # jadi float, bukan object
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    # lewat pa.Table supaya semua kolom (termasuk int/float numpy) jadi
+    # ArrowDtype; convert_dtypes tidak konsisten untuk kolom numerik
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
 def load_competency_gap():
     sql = """
     WITH joined AS (
@@ -27,45 +57,62 @@ def load_competency_gap():
           ON c.employee_id = lp.employee_id
         JOIN dim_competency_pillars dcp
           ON c.pillar_code = dcp.pillar_code
+    ),
+    agg AS (
+        SELECT
+            pillar_code,
+            pillar_label,
+            AVG(score) FILTER (WHERE rating = 5)  AS avg_high,
+            AVG(score) FILTER (WHERE rating <> 5) AS avg_other
+        FROM joined
+        GROUP BY pillar_code, pillar_label
     )
     SELECT
         pillar_code,
         pillar_label,
-        AVG(CASE WHEN rating = 5 THEN score END)  AS avg_high,
-        AVG(CASE WHEN rating <> 5 THEN score END) AS avg_other,
-        AVG(CASE WHEN rating = 5 THEN score END)
-        - AVG(CASE WHEN rating <> 5 THEN score END) AS diff_high_minus_other
-    FROM joined
-    GROUP BY pillar_code, pillar_label
+        avg_high,
+        avg_other,
+        avg_high - avg_other AS diff_high_minus_other
+    FROM agg
     ORDER BY diff_high_minus_other DESC;
     """
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn)
-    return df
+    return fetch_df(sql)
+
+
+COGNITIVE_VARS = ["iq", "gtq", "tiki", "pauli", "faxtor"]
+DEFAULT_COGNITIVE_VARS = ("pauli", "gtq")
 
 
-def load_cognitive_data():
+@st.cache_data(ttl=300, show_spinner=False)
+def load_cognitive_data(variables=DEFAULT_COGNITIVE_VARS):
+    """
+    Skor cognitive dalam format long (perf_group, variable, value), di-unpivot
+    langsung di Postgres dan hanya untuk variable yang dipilih.
+    """
     sql = """
     SELECT
         CASE WHEN lp.rating = 5 THEN 'High (5)'
              ELSE 'Non-High (≠5)'
         END AS perf_group,
-        pp.iq,
-        pp.gtq,
-        pp.tiki,
-        pp.pauli,
-        pp.faxtor
+        v.variable,
+        v.value
     FROM profiles_psych pp
     JOIN v_employee_performance_latest lp
-      ON pp.employee_id = lp.employee_id;
+      ON pp.employee_id = lp.employee_id
+    CROSS JOIN LATERAL (
+        VALUES
+            ('iq',     pp.iq::float8),
+            ('gtq',    pp.gtq::float8),
+            ('tiki',   pp.tiki::float8),
+            ('pauli',  pp.pauli::float8),
+            ('faxtor', pp.faxtor::float8)
+    ) AS v(variable, value)
+    WHERE v.variable = ANY(CAST(:variables AS text[]));
     """
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn)
-    return df
+    return fetch_df(sql, {"variables": list(variables)})
 
 
+@st.cache_data(ttl=300, show_spinner=False)
 def load_top_strengths(top_n=5):
     sql = """
     WITH latest_perf AS (
@@ -102,70 +149,151 @@ def load_top_strengths(top_n=5):
     ORDER BY pct_high DESC
     LIMIT :top_n;
     """
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn, params={"top_n": top_n})
-    return df
+    return fetch_df(sql, {"top_n": top_n})
+
 
+@st.cache_data(ttl=300, show_spinner=False)
+def load_match_detail(employee_id):
+    # detail TV/TGV satu employee, diambil hanya saat employee-nya dipilih
+    sql = "SELECT * FROM v_talent_match WHERE employee_id = :employee_id;"
+    return fetch_df(sql, {"employee_id": employee_id})
 
-def load_talent_match():
-    sql = "SELECT * FROM v_talent_match;"
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn)
-    return df
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_talent_ranking():
+    # satu baris per employee, bukan satu baris per TV seperti v_talent_match
+    sql = """
+    SELECT employee_id, fullname, final_match_rate
+    FROM v_talent_match
+    GROUP BY employee_id, fullname, final_match_rate
+    ORDER BY final_match_rate DESC NULLS LAST;
+    """
+    return fetch_df(sql)
 
 
+@st.cache_data(ttl=300, show_spinner=False)
 def load_talent_summary():
     sql = "SELECT * FROM v_talent_summary;"
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn)
-    return df
+    return fetch_df(sql)
 
 
-def load_ranked_talent_list():
-    """
-    Ambil final_match_rate per employee + info organisasi (role, division, dll).
-    Kita pakai v_talent_match sebagai sumber final_match_rate,
-    lalu join ke tabel employees & dim_* untuk info tambahan.
-    """
-    sql = """
-    WITH ranked AS (
-        SELECT
-            employee_id,
-            fullname,
-            final_match_rate
-        FROM v_talent_match
-        GROUP BY employee_id, fullname, final_match_rate
-    )
-    SELECT
-        r.employee_id,
-        r.fullname,
-        r.final_match_rate,
-        dp.name  AS department,
-        dv.name  AS division,
-        dr.name  AS directorate,
-        dg.name  AS job_level,
-        po.name  AS role
-    FROM ranked r
+RANKED_TALENT_FROM = """
+    FROM v_talent_match tm
     JOIN employees e
-      ON r.employee_id = e.employee_id
+      ON tm.employee_id = e.employee_id
     LEFT JOIN dim_departments  dp ON e.department_id  = dp.department_id
     LEFT JOIN dim_divisions    dv ON e.division_id    = dv.division_id
     LEFT JOIN dim_directorates dr ON e.directorate_id = dr.directorate_id
     LEFT JOIN dim_grades       dg ON e.grade_id       = dg.grade_id
     LEFT JOIN dim_positions    po ON e.position_id    = po.position_id
-    ORDER BY r.final_match_rate DESC;
+    WHERE tm.fullname ILIKE :q
+       OR tm.employee_id::text ILIKE :q
+       OR po.name ILIKE :q
+"""
+
+
+def search_pattern(search):
+    # ILIKE sudah case-insensitive: normalisasi sekali di sini supaya
+    # 'Jane', 'jane ' dan 'jane' memakai cache query yang sama.
+    # Wildcard LIKE di-escape supaya input user dicari apa adanya.
+    escaped = (
+        search.strip()
+        .lower()
+        .replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+    return f"%{escaped}%"
+
+
+RANKED_TALENT_COUNT_SQL = (
+    "SELECT COUNT(DISTINCT tm.employee_id) AS total" + RANKED_TALENT_FROM
+)
+
+RANKED_TALENT_PAGE_SQL = (
+    """
+    SELECT DISTINCT
+        tm.employee_id,
+        tm.fullname,
+        tm.final_match_rate,
+        dp.name  AS department,
+        dv.name  AS division,
+        dr.name  AS directorate,
+        dg.name  AS job_level,
+        po.name  AS role
+    """
+    + RANKED_TALENT_FROM
+    + """
+    ORDER BY tm.final_match_rate DESC, tm.employee_id
+    LIMIT :limit OFFSET :offset;
     """
-    eng = get_engine()
-    with eng.connect() as conn:
-        df = pd.read_sql(text(sql), conn)
-    return df
+)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def count_ranked_talent(q="%"):
+    df = fetch_df(RANKED_TALENT_COUNT_SQL, {"q": q})
+    return int(df["total"].iloc[0])
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_ranked_talent_page(q="%", limit=10, offset=0):
+    """
+    Ambil satu halaman final_match_rate per employee + info organisasi
+    (role, division, dll), sudah difilter search (nama / employee_id / role)
+    dan dipaginasi di Postgres. `q` adalah pattern dari search_pattern().
+    DISTINCT karena v_talent_match berisi satu baris per TV.
+    """
+    params = {"q": q, "limit": limit, "offset": offset}
+    return fetch_df(RANKED_TALENT_PAGE_SQL, params)
+
+
+def run_concurrently(*loaders):
+    """
+    Jalankan beberapa loader yang saling independen di thread terpisah,
+    supaya round-trip ke Postgres berjalan overlap (pakai pool dari get_engine).
+    Hasil dikembalikan sesuai urutan loader.
+    """
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=len(loaders),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    ) as pool:
+        futures = [pool.submit(loader) for loader in loaders]
+        return [f.result() for f in futures]
+
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+LLM_MODEL = "x-ai/grok-4.1-fast:free"
+LLM_CACHE_TTL = 3600
+LLM_CACHE_MAX_ENTRIES = 128
 
-def call_llm(prompt: str, model: str = "x-ai/grok-4.1-fast:free") -> str:
-    url = "https://openrouter.ai/api/v1/chat/completions"
+
+@st.cache_resource
+def get_http_session():
+    # satu session untuk semua panggilan LLM: koneksi TLS ke OpenRouter dipakai
+    # ulang antar rerun, dan error sementara (429/5xx) di-retry dengan backoff
+    # read=0: completion yang timeout jangan dikirim ulang (bisa generate dobel
+    # dan blocking bermenit-menit); yang di-retry hanya status di bawah dan
+    # kegagalan koneksi
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry),
+    )
+    return session
+
+
+def llm_request(prompt: str, model: str, stream: bool = False):
     headers = {
         "Authorization": f"Bearer {st.secrets['openrouter']['api_key']}",
         "HTTP-Referer": "http://localhost:8501",  # ganti ke URL app-mu kalau di-deploy
@@ -187,374 +315,394 @@ def call_llm(prompt: str, model: str = "x-ai/grok-4.1-fast:free") -> str:
             {"role": "user", "content": prompt},
         ],
         "temperature": 0.4,
+        "stream": stream,
     }
+    return get_http_session().post(
+        OPENROUTER_URL, headers=headers, json=data, timeout=90, stream=stream
+    )
+
 
-    resp = requests.post(url, headers=headers, json=data, timeout=90)
+@st.cache_data(
+    ttl=LLM_CACHE_TTL, show_spinner=False, max_entries=LLM_CACHE_MAX_ENTRIES
+)
+def call_llm(prompt: str, model: str = LLM_MODEL) -> str:
+    resp = llm_request(prompt, model)
     if resp.status_code != 200:
         raise Exception(f"{resp.status_code} {resp.text}")
     return resp.json()["choices"][0]["message"]["content"]
 
 
-st.set_page_config(page_title="Dashboard Company X", layout="wide")
+def call_llm_stream(prompt: str, model: str = LLM_MODEL):
+    """
+    Versi streaming (SSE) dari call_llm: yield potongan teks begitu diterima,
+    untuk dipakai dengan st.write_stream.
+    """
+    with llm_request(prompt, model, stream=True) as resp:
+        if resp.status_code != 200:
+            raise Exception(f"{resp.status_code} {resp.text}")
+        resp.encoding = "utf-8"
+        for line in resp.iter_lines(decode_unicode=True):
+            # selain "data:", OpenRouter juga kirim komentar keep-alive (": ...")
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:") :].strip()
+            if payload == "[DONE]":
+                break
+            chunk = json.loads(payload)
+            if "error" in chunk:
+                raise Exception(chunk["error"].get("message", chunk["error"]))
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+
+def get_cached_stream_result(key):
+    """
+    Hasil call_llm_stream tidak bisa lewat st.cache_data, jadi disimpan per
+    session dengan batas yang sama (LLM_CACHE_TTL / LLM_CACHE_MAX_ENTRIES)
+    supaya submit ulang dengan input sama tidak memanggil API lagi.
+    """
+    cache = st.session_state.setdefault("llm_stream_cache", {})
+    now = time.time()
+    for k in [k for k, (ts, _) in cache.items() if now - ts > LLM_CACHE_TTL]:
+        del cache[k]
+    hit = cache.get(key)
+    return hit[1] if hit else None
+
+
+def cache_stream_result(key, result):
+    cache = st.session_state.setdefault("llm_stream_cache", {})
+    cache.pop(key, None)
+    cache[key] = (time.time(), result)
+    # dict urut sesuai insert: entry paling lama dibuang duluan
+    while len(cache) > LLM_CACHE_MAX_ENTRIES:
+        del cache[next(iter(cache))]
+
+
+@st.fragment
+def render_competency_gap():
+    df_comp = load_competency_gap()
+
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        chart_comp = (
+            alt.Chart(df_comp)
+            .mark_bar()
+            .encode(
+                x=alt.X("pillar_code:N", title="Pillar"),
+                y=alt.Y("diff_high_minus_other:Q", title="Gap Skor (High - Non-High)"),
+                tooltip=[
+                    "pillar_code",
+                    "pillar_label",
+                    alt.Tooltip("avg_high:Q", title="Avg High"),
+                    alt.Tooltip("avg_other:Q", title="Avg Other"),
+                    alt.Tooltip("diff_high_minus_other:Q", title="Gap"),
+                ],
+            )
+            .properties(height=350)
+        )
+        st.altair_chart(chart_comp, use_container_width=True)
 
-st.title("Step 1 – Success Pattern Discovery Dashboard")
-st.caption(
-    "Competency • Cognitive • Strengths – berdasarkan rating kinerja (High performer = rating 5)"
-)
+    with col2:
+        st.write("**Tabel Ringkas Competency**")
+        st.dataframe(df_comp)
 
-st.subheader("1. Competency Gap – High vs Non-High Performers")
 
-df_comp = load_competency_gap()
+@st.fragment
+def render_cognitive_distribution():
+    selected_vars = st.multiselect(
+        "Pilih cognitive variables untuk ditampilkan:",
+        options=COGNITIVE_VARS,
+        default=list(DEFAULT_COGNITIVE_VARS),
+        key="cognitive_vars",
+    )
 
-col1, col2 = st.columns([2, 1])
+    df_cog = load_cognitive_data(tuple(selected_vars))
 
-with col1:
-    chart_comp = (
-        alt.Chart(df_comp)
-        .mark_bar()
+    chart_cog = (
+        alt.Chart(df_cog)
+        .mark_boxplot()
         .encode(
-            x=alt.X("pillar_code:N", title="Pillar"),
-            y=alt.Y("diff_high_minus_other:Q", title="Gap Skor (High - Non-High)"),
-            tooltip=[
-                "pillar_code",
-                "pillar_label",
-                alt.Tooltip("avg_high:Q", title="Avg High"),
-                alt.Tooltip("avg_other:Q", title="Avg Other"),
-                alt.Tooltip("diff_high_minus_other:Q", title="Gap"),
-            ],
+            x=alt.X("variable:N", title="Variable"),
+            y=alt.Y("value:Q", title="Score"),
+            color=alt.Color("perf_group:N", title="Performance Group"),
+            tooltip=["perf_group", "variable", "value"],
         )
         .properties(height=350)
     )
-    st.altair_chart(chart_comp, use_container_width=True)
 
-with col2:
-    st.write("**Tabel Ringkas Competency**")
-    st.dataframe(df_comp)
+    st.altair_chart(chart_cog, use_container_width=True)
 
-st.markdown("---")
 
+@st.fragment
+def render_top_strengths():
+    top_n_strengths = st.slider(
+        "Pilih jumlah Top Strengths yang ingin ditampilkan:",
+        min_value=3,
+        max_value=15,
+        value=5,
+        help="Atur berapa banyak tema strengths teratas yang ingin kamu tampilkan di chart.",
+        key="top_n_strengths",
+    )
 
-st.subheader("2. Cognitive Distribution – High vs Non-High")
-
-df_cog = load_cognitive_data()
+    df_str = load_top_strengths(top_n_strengths)
 
-df_cog_long = df_cog.melt(
-    id_vars="perf_group",
-    value_vars=["iq", "gtq", "tiki", "pauli", "faxtor"],
-    var_name="variable",
-    value_name="value",
-)
+    col3, col4 = st.columns([2, 1])
 
-selected_vars = st.multiselect(
-    "Pilih cognitive variables untuk ditampilkan:",
-    options=["iq", "gtq", "tiki", "pauli", "faxtor"],
-    default=["pauli", "gtq"],
-)
+    with col3:
+        chart_str = (
+            alt.Chart(df_str)
+            .mark_bar()
+            .encode(
+                x=alt.X("theme:N", sort="-y", title="Theme"),
+                y=alt.Y("pct_high:Q", title="% High Performer with Theme"),
+                tooltip=["theme", "pct_high", "cnt_high"],
+            )
+            .properties(height=350)
+        )
+        st.altair_chart(chart_str, use_container_width=True)
 
-df_cog_filtered = df_cog_long[df_cog_long["variable"].isin(selected_vars)]
+    with col4:
+        st.write("**Data Top Strengths (High Performer)**")
+        st.dataframe(df_str)
 
-chart_cog = (
-    alt.Chart(df_cog_filtered)
-    .mark_boxplot()
-    .encode(
-        x=alt.X("variable:N", title="Variable"),
-        y=alt.Y("value:Q", title="Score"),
-        color=alt.Color("perf_group:N", title="Performance Group"),
-        tooltip=["perf_group", "variable", "value"],
-    )
-    .properties(height=350)
-)
 
-st.altair_chart(chart_cog, use_container_width=True)
+@st.fragment
+def render_talent_match():
+    df_match_emp = load_talent_ranking()
 
-st.markdown("---")
+    st.write("**Ranking Final Match Rate**")
+    st.dataframe(df_match_emp)
 
-st.subheader("3. Top Strengths Themes – High Performers (Rating = 5)")
+    top_n = st.slider("Show Top N employees by match rate", 3, 50, 10)
 
-top_n_strengths = st.slider(
-    "Pilih jumlah Top Strengths yang ingin ditampilkan:",
-    min_value=3,
-    max_value=15,
-    value=5,
-    help="Atur berapa banyak tema strengths teratas yang ingin kamu tampilkan di chart.",
-)
+    df_top = df_match_emp.head(top_n)
 
-df_str = load_top_strengths(top_n_strengths)
-
-
-col3, col4 = st.columns([2, 1])
-
-with col3:
-    chart_str = (
-        alt.Chart(df_str)
+    chart_match = (
+        alt.Chart(df_top)
         .mark_bar()
         .encode(
-            x=alt.X("theme:N", sort="-y", title="Theme"),
-            y=alt.Y("pct_high:Q", title="% High Performer with Theme"),
-            tooltip=["theme", "pct_high", "cnt_high"],
+            x=alt.X("fullname:N", sort="-y", title="Employee"),
+            y=alt.Y("final_match_rate:Q", title="Final Match Rate"),
+            tooltip=["employee_id", "fullname", "final_match_rate"],
         )
         .properties(height=350)
     )
-    st.altair_chart(chart_str, use_container_width=True)
-
-with col4:
-    st.write("**Data Top Strengths (High Performer)**")
-    st.dataframe(df_str)
 
+    st.altair_chart(chart_match, use_container_width=True)
 
-st.markdown("---")
-st.subheader("4. Talent Match – Final Match Rate per Employee")
-
-df_match = load_talent_match()
-
-df_match_emp = (
-    df_match[["employee_id", "fullname", "final_match_rate"]]
-    .drop_duplicates()
-    .sort_values("final_match_rate", ascending=False)
-)
+    st.markdown("### Detail per TGV & TV")
 
-st.write("**Ranking Final Match Rate**")
-st.dataframe(df_match_emp)
-
-top_n = st.slider("Show Top N employees by match rate", 3, 50, 10)
-
-df_top = df_match_emp.head(top_n)
-
-chart_match = (
-    alt.Chart(df_top)
-    .mark_bar()
-    .encode(
-        x=alt.X("fullname:N", sort="-y", title="Employee"),
-        y=alt.Y("final_match_rate:Q", title="Final Match Rate"),
-        tooltip=["employee_id", "fullname", "final_match_rate"],
+    selected_emp = st.selectbox(
+        "Pilih employee untuk lihat detail:",
+        df_match_emp["fullname"],
     )
-    .properties(height=350)
-)
-
-st.altair_chart(chart_match, use_container_width=True)
 
-st.markdown("### Detail per TGV & TV")
+    emp_id = df_match_emp.loc[
+        df_match_emp["fullname"] == selected_emp, "employee_id"
+    ].iloc[0]
+    df_detail = load_match_detail(emp_id)
 
-selected_emp = st.selectbox(
-    "Pilih employee untuk lihat detail:",
-    df_match_emp["fullname"],
-)
-
-emp_id = df_match_emp.loc[df_match_emp["fullname"] == selected_emp, "employee_id"].iloc[
-    0
-]
-df_detail = df_match[df_match["employee_id"] == emp_id]
-
-st.write(f"**Detail Match untuk:** {selected_emp} ({emp_id})")
-st.dataframe(df_detail.sort_values(["tgv_name", "tv_name"]))
-
-
-st.markdown("---")
-st.header("Step 2 – Talent Match Analysis")
+    st.write(f"**Detail Match untuk:** {selected_emp} ({emp_id})")
+    st.dataframe(df_detail.sort_values(["tgv_name", "tv_name"]))
 
-df_match = load_talent_match()
 
-col1, col2 = st.columns([1, 1.5])
+@st.fragment
+def render_talent_analysis():
+    col1, col2 = st.columns([1, 1.5])
 
-with col1:
-    st.subheader("🏆 Ranking by Final Match Rate")
-    df_rank = (
-        df_match[["employee_id", "fullname", "final_match_rate"]]
-        .drop_duplicates()
-        .sort_values("final_match_rate", ascending=False)
-    )
-    st.dataframe(df_rank, height=400)
+    with col1:
+        st.subheader("🏆 Ranking by Final Match Rate")
+        df_rank = load_talent_ranking()
+        st.dataframe(df_rank, height=400)
 
-    top_n = st.slider("Show Top N Employees", 3, 30, 10)
-    chart_rank = (
-        alt.Chart(df_rank.head(top_n))
-        .mark_bar()
-        .encode(
-            x=alt.X("fullname:N", sort="-y", title="Employee"),
-            y=alt.Y("final_match_rate:Q", title="Final Match Rate (%)"),
-            tooltip=["employee_id", "fullname", "final_match_rate"],
+        top_n = st.slider("Show Top N Employees", 3, 30, 10)
+        chart_rank = (
+            alt.Chart(df_rank.head(top_n))
+            .mark_bar()
+            .encode(
+                x=alt.X("fullname:N", sort="-y", title="Employee"),
+                y=alt.Y("final_match_rate:Q", title="Final Match Rate (%)"),
+                tooltip=["employee_id", "fullname", "final_match_rate"],
+            )
+            .properties(height=350)
         )
-        .properties(height=350)
-    )
-    st.altair_chart(chart_rank, use_container_width=True)
-
-with col2:
-    st.subheader("🔍 Detail per Employee")
-    selected_emp = st.selectbox(
-        "Pilih Employee untuk Lihat Detail:",
-        df_match["fullname"].unique(),
-    )
+        st.altair_chart(chart_rank, use_container_width=True)
 
-    df_emp = df_match[df_match["fullname"] == selected_emp]
-    st.write(f"**{selected_emp}** – breakdown per TGV dan TV")
-
-    chart_tgv = (
-        alt.Chart(df_emp)
-        .mark_bar()
-        .encode(
-            x=alt.X("tgv_name:N", title="Talent Group"),
-            y=alt.Y("tgv_match_rate:Q", title="TGV Match Rate (%)"),
-            color="tgv_name:N",
-            tooltip=["tgv_name", "tgv_match_rate"],
+    with col2:
+        st.subheader("🔍 Detail per Employee")
+        selected_emp = st.selectbox(
+            "Pilih Employee untuk Lihat Detail:",
+            df_rank["fullname"].unique(),
         )
-        .properties(height=300)
-    )
 
-    st.altair_chart(chart_tgv, use_container_width=True)
-    st.dataframe(df_emp[["tgv_name", "tv_name", "tv_match_rate"]])
+        emp_id = df_rank.loc[df_rank["fullname"] == selected_emp, "employee_id"].iloc[0]
+        df_emp = load_match_detail(emp_id)
+        st.write(f"**{selected_emp}** – breakdown per TGV dan TV")
+
+        # chart cuma butuh satu baris per TGV, jangan kirim semua baris TV ke browser
+        df_emp_tgv = df_emp[["tgv_name", "tgv_match_rate"]].drop_duplicates()
+
+        chart_tgv = (
+            alt.Chart(df_emp_tgv)
+            .mark_bar()
+            .encode(
+                x=alt.X("tgv_name:N", title="Talent Group"),
+                y=alt.Y("tgv_match_rate:Q", title="TGV Match Rate (%)"),
+                color="tgv_name:N",
+                tooltip=["tgv_name", "tgv_match_rate"],
+            )
+            .properties(height=300)
+        )
 
+        st.altair_chart(chart_tgv, use_container_width=True)
+        st.dataframe(df_emp[["tgv_name", "tv_name", "tv_match_rate"]])
 
-st.markdown("---")
-st.header("Step 3 – Role-based JD & Variable Score (AI Assistant)")
 
-df_match_all = load_talent_match()
-df_rank = load_ranked_talent_list()
+@st.fragment
+def render_role_assistant():
+    search = st.text_input(
+        "Cari nama / employee_id / role (contoh: 'jane', '312', 'Data Analyst')"
+    )
 
-search = st.text_input(
-    "Cari nama / employee_id / role (contoh: 'jane', '312', 'Data Analyst')"
-)
+    search_q = search_pattern(search)
+
+    page_size = 10
+    total_rows = count_ranked_talent(search_q)
+    total_pages = max(1, math.ceil(total_rows / page_size))
+
+    col_p1, col_p2 = st.columns([3, 1])
+    with col_p1:
+        st.caption(f"Showing top {min(total_rows, page_size)} of {total_rows} results")
+    with col_p2:
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            step=1,
+        )
 
-df_filtered = df_rank.copy()
-
-if search:
-    search_lower = search.lower()
-    df_filtered = df_filtered[
-        df_filtered["fullname"].str.lower().str.contains(search_lower, na=False)
-        | df_filtered["employee_id"]
-        .astype(str)
-        .str.lower()
-        .str.contains(search_lower, na=False)
-        | df_filtered["role"]
-        .fillna("")
-        .str.lower()
-        .str.contains(search_lower, na=False)
-    ]
-
-page_size = 10
-total_rows = len(df_filtered)
-total_pages = max(1, math.ceil(total_rows / page_size))
-
-col_p1, col_p2 = st.columns([3, 1])
-with col_p1:
-    st.caption(f"Showing top {min(total_rows, page_size)} of {total_rows} results")
-with col_p2:
-    page = st.number_input(
-        "Page",
-        min_value=1,
-        max_value=total_pages,
-        value=1,
-        step=1,
+    df_page = load_ranked_talent_page(search_q, page_size, (page - 1) * page_size)
+
+    st.dataframe(
+        df_page[
+            [
+                "employee_id",
+                "fullname",
+                "final_match_rate",
+                "role",
+                "division",
+                "department",
+                "directorate",
+                "job_level",
+            ]
+        ],
+        use_container_width=True,
     )
 
-start_idx = (page - 1) * page_size
-end_idx = start_idx + page_size
-
-st.dataframe(
-    df_filtered.iloc[start_idx:end_idx].reset_index(drop=True)[
-        [
-            "employee_id",
-            "fullname",
-            "final_match_rate",
-            "role",
-            "division",
-            "department",
-            "directorate",
-            "job_level",
-        ]
-    ],
-    use_container_width=True,
-)
-
-st.caption(f"Page {page} of {total_pages}")
+    st.caption(f"Page {page} of {total_pages}")
 
-df_emp_summary = (
-    df_match_all[["employee_id", "fullname", "final_match_rate"]]
-    .drop_duplicates()
-    .sort_values("final_match_rate", ascending=False)
-)
+    df_emp_summary = load_talent_ranking()
 
-st.subheader("Role Summary")
+    st.subheader("Role Summary")
 
-summary_col1, summary_col2 = st.columns(2)
+    summary_col1, summary_col2 = st.columns(2)
 
-with summary_col1:
-    default_role_name = "Data Analyst"
-    default_job_level = "Middle"
+    with summary_col1:
+        default_role_name = "Data Analyst"
+        default_job_level = "Middle"
 
-    st.write("**Role Name:**", default_role_name)
-    st.write("**Job Level:**", default_job_level)
+        st.write("**Role Name:**", default_role_name)
+        st.write("**Job Level:**", default_job_level)
 
-with summary_col2:
-    st.write("**Selected benchmark employee IDs:**")
-    st.write("_(akan muncul setelah kamu pilih di form di bawah)_")
+    with summary_col2:
+        st.write("**Selected benchmark employee IDs:**")
+        st.write("_(akan muncul setelah kamu pilih di form di bawah)_")
 
-st.markdown("")
+    st.markdown("")
 
-st.subheader("1. Role Information")
+    st.subheader("1. Role Information")
 
-with st.form("role_form"):
-    role_name = st.text_input(
-        "Role Name", value=default_role_name, help="Nama jabatan yang ingin dianalisis"
-    )
-    job_level = st.selectbox(
-        "Job Level",
-        options=["Junior", "Middle", "Senior", "Lead"],
-        index=1,
-    )
-    role_purpose = st.text_area(
-        "Role Purpose",
-        placeholder="1–2 kalimat untuk menjelaskan outcome utama role ini",
-        help="Contoh: Memastikan analisis data mendukung keputusan bisnis dengan akurat dan tepat waktu.",
-    )
+    with st.form("role_form"):
+        role_name = st.text_input(
+            "Role Name", value=default_role_name, help="Nama jabatan yang ingin dianalisis"
+        )
+        job_level = st.selectbox(
+            "Job Level",
+            options=["Junior", "Middle", "Senior", "Lead"],
+            index=1,
+        )
+        role_purpose = st.text_area(
+            "Role Purpose",
+            placeholder="1–2 kalimat untuk menjelaskan outcome utama role ini",
+            help="Contoh: Memastikan analisis data mendukung keputusan bisnis dengan akurat dan tepat waktu.",
+        )
 
-    st.markdown("**Employee Benchmarking**")
-    st.caption("Pilih maks. 3 karyawan sebagai benchmark high performer untuk role ini")
+        st.markdown("**Employee Benchmarking**")
+        st.caption("Pilih maks. 3 karyawan sebagai benchmark high performer untuk role ini")
+
+        df_emp_summary["label"] = (
+            df_emp_summary["fullname"].fillna("None").astype(str)
+            + " (ID: "
+            + df_emp_summary["employee_id"].astype(str)
+            + ", Match: "
+            + df_emp_summary["final_match_rate"]
+            .astype("float64")
+            .map("{:.1f}".format)
+            + "%)"
+        )
+        label_to_id = dict(zip(df_emp_summary["label"], df_emp_summary["employee_id"]))
 
-    df_emp_summary["label"] = df_emp_summary.apply(
-        lambda r: f"{r['fullname']} (ID: {r['employee_id']}, Match: {r['final_match_rate']:.1f}%)",
-        axis=1,
-    )
+        selected_labels = st.multiselect(
+            "Select Employee Benchmarking (max 3)",
+            options=df_emp_summary["label"].tolist(),
+            max_selections=3,
+        )
 
-    selected_labels = st.multiselect(
-        "Select Employee Benchmarking (max 3)",
-        options=df_emp_summary["label"].tolist(),
-        max_selections=3,
-    )
+        submitted = st.form_submit_button("Generate Job Description & Variable score")
+
+    if submitted:
+        if len(selected_labels) == 0:
+            st.error("Minimal pilih 1 employee sebagai benchmark.")
+        elif len(selected_labels) > 3:
+            st.error("Maksimal 3 employee sebagai benchmark.")
+        else:
+            selected_ids = [label_to_id[lbl] for lbl in selected_labels]
+            df_bench = pd.concat(
+                run_concurrently(
+                    *(partial(load_match_detail, emp_id) for emp_id in selected_ids)
+                ),
+                ignore_index=True,
+            )
+            # NULL dari fetch_df berupa pd.NA; jadikan float NaN supaya
+            # float() dan format :.2f di prompt tetap jalan (tampil "nan")
+            df_bench = df_bench.astype(
+                {
+                    "final_match_rate": "float64",
+                    "tgv_match_rate": "float64",
+                    "tv_match_rate": "float64",
+                }
+            )
 
-    submitted = st.form_submit_button("Generate Job Description & Variable score")
-
-if submitted:
-    if len(selected_labels) == 0:
-        st.error("Minimal pilih 1 employee sebagai benchmark.")
-    elif len(selected_labels) > 3:
-        st.error("Maksimal 3 employee sebagai benchmark.")
-    else:
-        selected_ids = []
-        for lbl in selected_labels:
-            emp_id = lbl.split("ID:")[1].split(",")[0].strip()
-            selected_ids.append(emp_id)
-        df_bench = df_match_all[df_match_all["employee_id"].isin(selected_ids)]
-
-        st.markdown("### Benchmark Employees")
-        st.write(", ".join(selected_ids))
-        st.dataframe(
-            df_bench[
-                [
-                    "employee_id",
-                    "fullname",
-                    "tgv_name",
-                    "tv_name",
-                    "tv_match_rate",
-                    "tgv_match_rate",
-                    "final_match_rate",
-                ]
-            ].sort_values(["employee_id", "tgv_name", "tv_name"])
-        )
+            st.markdown("### Benchmark Employees")
+            st.write(", ".join(map(str, selected_ids)))
+            st.dataframe(
+                df_bench[
+                    [
+                        "employee_id",
+                        "fullname",
+                        "tgv_name",
+                        "tv_name",
+                        "tv_match_rate",
+                        "tgv_match_rate",
+                        "final_match_rate",
+                    ]
+                ].sort_values(["employee_id", "tgv_name", "tv_name"])
+            )
 
-        grouped = []
-        for emp_id in selected_ids:
-            sub = df_bench[df_bench["employee_id"] == emp_id]
-            grouped.append(
+            grouped = [
                 {
                     "employee_id": emp_id,
                     "fullname": sub["fullname"].iloc[0],
@@ -564,80 +712,139 @@ if submitted:
                         .drop_duplicates()
                         .to_dict(orient="records")
                     ),
-                    "tv": (
-                        sub[["tgv_name", "tv_name", "tv_match_rate"]].to_dict(
-                            orient="records"
-                        )
+                    "tv": sub[["tgv_name", "tv_name", "tv_match_rate"]].to_dict(
+                        orient="records"
                     ),
                 }
+                for emp_id, sub in df_bench.groupby("employee_id", sort=False)
+            ]
+
+            context = "Role information:\n"
+            context += f"- Role Name: {role_name}\n"
+            context += f"- Job Level: {job_level}\n"
+            if role_purpose:
+                context += f"- Role Purpose: {role_purpose}\n"
+            context += "\nBenchmark employees:\n\n"
+
+            for g in grouped:
+                context += f"Nama: {g['fullname']} (ID: {g['employee_id']})\n"
+                context += f"Final match rate: {g['final_match_rate']:.2f}\n"
+                context += "TGV summary:\n"
+                for t in g["tgv"]:
+                    context += f"  - {t['tgv_name']}: {t['tgv_match_rate']:.2f}\n"
+                context += "Key TV (variables):\n"
+                for v in g["tv"]:
+                    context += (
+                        f"  - [{v['tgv_name']}] {v['tv_name']}: {v['tv_match_rate']:.2f}\n"
+                    )
+                context += "\n"
+
+            prompt = (
+                "Kamu adalah HR analytics assistant.\n"
+                "Gunakan informasi role dan benchmark employees di bawah ini untuk:\n"
+                "1) Menyusun job description singkat (3–5 bullet) untuk role tersebut.\n"
+                "2) Menyusun daftar key variables (kompetensi, cognitive, strengths) beserta bobot / pentingnya.\n"
+                "3) Jelaskan secara singkat kenapa benchmark employees ini relevan.\n\n"
+                f"{context}\n\n"
+                "Jawab dalam bahasa Indonesia dengan format:\n"
+                "- Role Purpose & Key Outcomes\n"
+                "- Job Description (bullet points)\n"
+                "- Key Variables & Penjelasan singkat\n"
+                "- Catatan tambahan bagi HR / hiring manager."
             )
 
-        context = "Role information:\n"
-        context += f"- Role Name: {role_name}\n"
-        context += f"- Job Level: {job_level}\n"
-        if role_purpose:
-            context += f"- Role Purpose: {role_purpose}\n"
-        context += "\nBenchmark employees:\n\n"
-
-        for g in grouped:
-            context += f"Nama: {g['fullname']} (ID: {g['employee_id']})\n"
-            context += f"Final match rate: {g['final_match_rate']:.2f}\n"
-            context += "TGV summary:\n"
-            for t in g["tgv"]:
-                context += f"  - {t['tgv_name']}: {t['tgv_match_rate']:.2f}\n"
-            context += "Key TV (variables):\n"
-            for v in g["tv"]:
-                context += (
-                    f"  - [{v['tgv_name']}] {v['tv_name']}: {v['tv_match_rate']:.2f}\n"
-                )
-            context += "\n"
-
-        prompt = (
-            "Kamu adalah HR analytics assistant.\n"
-            "Gunakan informasi role dan benchmark employees di bawah ini untuk:\n"
-            "1) Menyusun job description singkat (3–5 bullet) untuk role tersebut.\n"
-            "2) Menyusun daftar key variables (kompetensi, cognitive, strengths) beserta bobot / pentingnya.\n"
-            "3) Jelaskan secara singkat kenapa benchmark employees ini relevan.\n\n"
-            f"{context}\n\n"
-            "Jawab dalam bahasa Indonesia dengan format:\n"
-            "- Role Purpose & Key Outcomes\n"
-            "- Job Description (bullet points)\n"
-            "- Key Variables & Penjelasan singkat\n"
-            "- Catatan tambahan bagi HR / hiring manager."
-        )
+            job_details_prompt = (
+                "Gunakan konteks berikut untuk membuat rincian Job Details yang terstruktur.\n\n"
+                f"{context}\n\n"
+                "Role Name: " + role_name + "\n"
+                "Job Level: " + job_level + "\n"
+                "Role Purpose: " + (role_purpose or "-") + "\n\n"
+                "Buat Job Details untuk role di atas dengan kategori:\n"
+                "1) Key Responsibilities\n"
+                "2) Work Inputs\n"
+                "3) Work Outputs\n"
+                "4) Qualifications\n"
+                "5) Competencies\n\n"
+                "Format jawaban:\n"
+                "## Key Responsibilities\n- ...\n\n"
+                "## Work Inputs\n- ...\n\n"
+                "## Work Outputs\n- ...\n\n"
+                "## Qualifications\n- ...\n\n"
+                "## Competencies\n- ..."
+            )
+
+            with st.spinner(
+                "Menghasilkan Job Description & Variable score dengan Grok 4.1 Fast..."
+            ):
+                # job details tidak bergantung ke hasil JD, jadi dikirim paralel
+                pool = ThreadPoolExecutor(max_workers=1)
+                try:
+                    job_details_future = pool.submit(call_llm, job_details_prompt)
+
+                    st.markdown("### Generated Job Description & Variable Score")
+                    jd_key = (prompt, LLM_MODEL)
+                    ai_result = get_cached_stream_result(jd_key)
+                    if ai_result is not None:
+                        st.markdown(ai_result)
+                    else:
+                        ai_result = st.write_stream(call_llm_stream(prompt))
+                        cache_stream_result(jd_key, ai_result)
+
+                    ai_job_details = job_details_future.result()
+
+                    st.markdown("### Job Details (AI Suggested)")
+                    st.markdown(ai_job_details)
+
+                except Exception as e:
+                    st.error(f"Error memanggil LLM: {e}")
+
+                finally:
+                    # kalau JD gagal, error langsung tampil tanpa menunggu
+                    # request job details yang masih berjalan di background
+                    pool.shutdown(wait=False, cancel_futures=True)
+
+
+st.set_page_config(page_title="Dashboard Company X", layout="wide")
+
+# Tiap section di bawah adalah fragment, jadi interaksi widget cuma me-rerun
+# section-nya sendiri. Saat full run, semua data awal diambil paralel dulu
+# supaya loader di tiap fragment langsung kena cache.
+run_concurrently(
+    load_competency_gap,
+    partial(
+        load_cognitive_data,
+        tuple(st.session_state.get("cognitive_vars", DEFAULT_COGNITIVE_VARS)),
+    ),
+    partial(load_top_strengths, st.session_state.get("top_n_strengths", 5)),
+    load_talent_ranking,
+)
 
-        with st.spinner(
-            "Menghasilkan Job Description & Variable score dengan Grok 4.1 Fast..."
-        ):
-            try:
-                ai_result = call_llm(prompt)
-                st.markdown("### Generated Job Description & Variable Score")
-                st.write(ai_result)
-
-                job_details_prompt = (
-                    "Gunakan konteks berikut untuk membuat rincian Job Details yang terstruktur.\n\n"
-                    f"{context}\n\n"
-                    "Role Name: " + role_name + "\n"
-                    "Job Level: " + job_level + "\n"
-                    "Role Purpose: " + (role_purpose or "-") + "\n\n"
-                    "Buat Job Details untuk role di atas dengan kategori:\n"
-                    "1) Key Responsibilities\n"
-                    "2) Work Inputs\n"
-                    "3) Work Outputs\n"
-                    "4) Qualifications\n"
-                    "5) Competencies\n\n"
-                    "Format jawaban:\n"
-                    "## Key Responsibilities\n- ...\n\n"
-                    "## Work Inputs\n- ...\n\n"
-                    "## Work Outputs\n- ...\n\n"
-                    "## Qualifications\n- ...\n\n"
-                    "## Competencies\n- ..."
-                )
-
-                ai_job_details = call_llm(job_details_prompt)
-
-                st.markdown("### Job Details (AI Suggested)")
-                st.markdown(ai_job_details)
-
-            except Exception as e:
-                st.error(f"Error memanggil LLM: {e}")
+st.title("Step 1 – Success Pattern Discovery Dashboard")
+st.caption(
+    "Competency • Cognitive • Strengths – berdasarkan rating kinerja (High performer = rating 5)"
+)
+
+st.subheader("1. Competency Gap – High vs Non-High Performers")
+render_competency_gap()
+
+st.markdown("---")
+
+st.subheader("2. Cognitive Distribution – High vs Non-High")
+render_cognitive_distribution()
+
+st.markdown("---")
+
+st.subheader("3. Top Strengths Themes – High Performers (Rating = 5)")
+render_top_strengths()
+
+st.markdown("---")
+st.subheader("4. Talent Match – Final Match Rate per Employee")
+render_talent_match()
+
+st.markdown("---")
+st.header("Step 2 – Talent Match Analysis")
+render_talent_analysis()
+
+st.markdown("---")
+st.header("Step 3 – Role-based JD & Variable Score (AI Assistant)")
+render_role_assistant()